@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# make `src` importable when running plain `pytest` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent))
@@ -5,45 +5,63 @@ Created on Thu Jan 30 21:04:00 2020
 
 @author: alparibal
 """
-import numpy as np
+
+from pathlib import Path
+from typing import Union
+
 import pandas as pd
-from postal.expand import expand_address
-from postal.parser import parse_address
-import json
-
-def expand(raw_addr):
-    addr = str(raw_addr) if pd.notna(raw_addr) else ""
-    addr = expand_address(addr)
-    return addr[0].upper() if len(addr) > 0 else ""
-
-states = "/home/alparibal/Desktop/idp-ws19/src/states.json"
-states = json.load(open(states, "r"))
-# invert the dict
-states = {v:k.upper() for k,v in states.items()}
-
-
-ch_path = "/home/alparibal/Desktop/IDP/company_dataset_identifier.xlsx"
-ch = pd.read_excel(ch_path,
-                   encoding="utf-8")
-ch["state_fixed"] = ch["state"].fillna("").map(lambda x: states[x] if x in states else "")
-ch["add"] = ch[["add1","add2","add3","add4"]].fillna("").apply(lambda x: " ".join(x), axis=1)
-ch["add_fixed"] = ch["add"].map(expand)
-ch = ch[["gvkey", "state_fixed", "add_fixed"]]
-ch.to_csv("/home/alparibal/Desktop/IDP/chair_addr.csv", index=False)
-
-
-us_path = "/home/alparibal/Desktop/idp-ws19/data/all_recipients.csv"
-us = pd.read_csv(us_path,
-                 usecols=['recipient_address_line_1', 'recipient_address_line_2',
-                           'recipient_state_code'],
-                 low_memory=False,
-                 encoding="utf-8")
-us.fillna("", inplace=True)
-us.drop_duplicates(inplace=True)
-us["recipient_state_fixed"] = us["recipient_state_code"].map(lambda x: states[x] if x in states else "")
-us["recipient_address_line"] = us[["recipient_address_line_1", "recipient_address_line_2"]].apply(lambda x: " ".join(x), axis=1)
-us["recipient_address_line_fixed"] = us["recipient_address_line"].map(lambda x: expand(x))
-us = us[[col for col in us.columns if col != "recipient_address_line"]]
-us.to_csv("/home/alparibal/Desktop/IDP/us_addr.csv", index=False)
-
-len(set(ch.add_fixed).intersection(set(us.recipient_address_line_fixed))) # 2628
+
+from .string_handlers import fix_addresses, fix_state
+
+
+def process_addresses(
+    chair_path: Union[str, Path],
+    us_path: Union[str, Path],
+    chair_out_path: Union[str, Path],
+    us_out_path: Union[str, Path],
+) -> int:
+    """Normalize the addresses of the chair and USAspending datasets.
+
+    State codes are converted to state names and address lines are joined and
+    expanded using `pypostal`. Results are written to `chair_out_path` and
+    `us_out_path`.
+
+    Parameters:
+        chair_path: Union[str, Path]
+            Path to the .xlsx file of the chair dataset.
+        us_path: Union[str, Path]
+            Path to the .csv file that includes all recipients.
+        chair_out_path: Union[str, Path]
+            Path to the .csv file in which processed chair addresses will be saved.
+        us_out_path: Union[str, Path]
+            Path to the .csv file in which processed recipient addresses will be saved.
+
+    Returns:
+        int
+            Number of expanded addresses that appear in both datasets.
+    """
+    ch = pd.read_excel(chair_path)
+    ch["state_fixed"] = ch["state"].fillna("").map(fix_state)
+    ch["add_fixed"] = fix_addresses(ch, ["add1", "add2", "add3", "add4"])
+    ch = ch[["gvkey", "state_fixed", "add_fixed"]]
+    ch.to_csv(chair_out_path, index=False)
+
+    us = pd.read_csv(
+        us_path,
+        usecols=[
+            "recipient_address_line_1",
+            "recipient_address_line_2",
+            "recipient_state_code",
+        ],
+        low_memory=False,
+        encoding="utf-8",
+    )
+    us.fillna("", inplace=True)
+    us.drop_duplicates(inplace=True)
+    us["recipient_state_fixed"] = us["recipient_state_code"].map(fix_state)
+    us["recipient_address_line_fixed"] = fix_addresses(
+        us, ["recipient_address_line_1", "recipient_address_line_2"]
+    )
+    us.to_csv(us_out_path, index=False)
+
+    return len(set(ch.add_fixed).intersection(set(us.recipient_address_line_fixed)))
@@ -0,0 +1,63 @@
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, Sequence
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+MODULES = (
+    "src.addr",
+    "src.csv_handlers",
+    "src.data_handlers",
+    "src.data_retrieval",
+    "src.matrix_ops",
+    "src.string_handlers",
+)
+
+
+def measure_import_time(module: str) -> float:
+    """Measure the cold-import time of a module in a fresh interpreter.
+
+    Parameters:
+        module: str
+            Dotted name of the module to import.
+
+    Returns:
+        float
+            Cumulative import time of `module` in seconds, as reported by
+            `python -X importtime`.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=str(REPO_DIR),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if proc.returncode != 0:
+        # the traceback is the last part of stderr, after the importtime lines
+        raise ImportError(f"Could not import {module}: {proc.stderr.splitlines()[-1]}")
+
+    # lines look like: "import time:   self [us] | cumulative | imported package"
+    for line in reversed(proc.stderr.splitlines()):
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1e6
+    raise ImportError(f"`-X importtime` did not report {module}.")
+
+
+def report_import_times(modules: Sequence[str] = MODULES) -> Dict[str, float]:
+    """Print and return the cold-import time of each module in `modules`."""
+    times = {}
+    for module in modules:
+        try:
+            times[module] = measure_import_time(module)
+            print(f"{module:<24}{times[module] * 1000:>10.1f} ms")
+        except ImportError as e:
+            print(f"{module:<24}{'failed':>10}  ({e})")
+    return times
+
+
+if __name__ == "__main__":
+    report_import_times(sys.argv[1:] or MODULES)
@@ -1,9 +1,15 @@
-from scipy import sparse
-from sklearn.metrics.pairwise import linear_kernel
+import json
+import os
+from pathlib import Path
+
 import numpy as np
 import pandas as pd
 
 def get_cosine_similarities(tfidf, tfidf_USA, thres = 0.4, save_path = '../processed/cosine_similarities.npz', batch_size=100):
+    # scipy and sklearn are slow to import, load them only when they are needed
+    from scipy import sparse
+    from sklearn.metrics.pairwise import linear_kernel
+
     cosine_similarities = sparse.csr_matrix((tfidf.shape[0],tfidf_USA.shape[0]))
     values = np.zeros(cosine_similarities.shape[0])
     indexes = np.zeros(cosine_similarities.shape[0])
@@ -31,6 +37,8 @@ def get_cosine_similarities(tfidf, tfidf_USA, thres = 0.4, save_path = '../proce
 
 
 def company_name_to_usa_df_mapping(companies, usa_df):
+    from scipy import sparse
+
     comp_df = pd.DataFrame(companies, columns=['company_name'])
     comp_df = comp_df.reset_index()
     comp_df = comp_df.set_index('company_name')
@@ -55,72 +63,160 @@ def company_name_to_usa_df_mapping(companies, usa_df):
     one_hot_parent_row = one_hot_parent.T.tocsr()
     return one_hot_row, one_hot_parent_row
 
-def get_best_candidates(chair_df, usa_df, cosine_similarities, companies, zip_bonus = 0.1, state_bonus=0.1,
-                        address_bonus= 0.3):
+def _score_candidates(i, chair_candidate, usa_df, cosine_similarities, comp_name_to_usa_mapping,
+                      parent_comp_name_to_usa_mapping, zip_bonus, state_bonus, address_bonus):
+    index = cosine_similarities[i].indices
+
+    if index.shape[0] == 0:
+        return None
+
+    usa_indexes = comp_name_to_usa_mapping[index].indices
+    parent_usa_indexes = parent_comp_name_to_usa_mapping[index].indices
+
+    expanded_cos_sims = []
+    # get child company cos sims
+    for j in range(len(cosine_similarities[i].indices)):
+        selection = comp_name_to_usa_mapping[index[j]]
+        expanded_cos_sims += [cosine_similarities[i].data[j]] * len(selection.indices)
+
+    # get parent company cos sims
+    for j in range(len(cosine_similarities[i].indices)):
+        selection = parent_comp_name_to_usa_mapping[index[j]]
+        expanded_cos_sims += [cosine_similarities[i].data[j]] * len(selection.indices)
+
+    child_candidates = usa_df.iloc[usa_indexes].copy()
+    child_candidates['matched_by_parent_name'] = False
+
+    parent_candidates = usa_df.iloc[parent_usa_indexes].copy()
+    parent_candidates['matched_by_parent_name'] = True
+
+    candidates = pd.concat([child_candidates,parent_candidates], ignore_index=True)
+    candidates['cos_sim'] = expanded_cos_sims
+    #candidates['cos_sim'] = candidates.groupby(candidates.index)['cos_sim'].max()
+    candidates = candidates.drop_duplicates()
+    is_zip_bonus = (candidates.recipient_zip_code == chair_candidate.addzip) * ~candidates.matched_by_parent_name
+    candidates['zip_bonus'] = zip_bonus * is_zip_bonus
+    is_state_bonus = (candidates.recipient_state_fixed == chair_candidate.state_fixed) * ~candidates.matched_by_parent_name
+    candidates['state_bonus'] = state_bonus * is_state_bonus
+    is_address_bonus = (candidates.recipient_address_line_fixed ==
+                        chair_candidate.add_fixed) * ~candidates.matched_by_parent_name
+    candidates['address_bonus'] = address_bonus * is_address_bonus
+
+    candidates['total_bonus'] = candidates.zip_bonus + candidates.state_bonus + candidates.address_bonus
+
+    both_have_state = np.logical_and(~pd.isna(candidates.recipient_state_fixed),
+                                     ~pd.isna(chair_candidate.state_fixed))
+
+    no_match_condition = np.logical_and(np.logical_and(~candidates.matched_by_parent_name,
+                                                       ~is_state_bonus),both_have_state)
+
+    candidates['total_bonus'] += -(candidates['total_bonus']+candidates.cos_sim)*no_match_condition
+
+    candidates['score'] = candidates.cos_sim + candidates.total_bonus
+    # TODO: take the one with most data/count
+    return candidates.loc[candidates.score.astype('float').idxmax()]
+
+
+def iter_best_candidates(chair_df, usa_df, cosine_similarities, companies, zip_bonus = 0.1, state_bonus=0.1,
+                         address_bonus= 0.3, chunk_size=1000, start=0):
+    """Yield the best match of every row of `chair_df` in chunks.
+
+    Scoring starts from the row at position `start`. Each yielded item is a
+    `(chunk_end, chunk)` tuple: `chunk` is a pd.DataFrame that holds the matches of
+    `chunk_size` consecutive rows of `chair_df`, indexed by their position in
+    `chair_df`, and `chunk_end` is the position right after the last scored row.
+    Rows without any candidate are left out of `chunk`, so `chunk_end` is yielded
+    separately to tell how far scoring got, even when `chunk` is empty. Callers use
+    it to checkpoint their progress.
+    """
     columns = list(chair_df.columns) + list(usa_df.columns) + ['cos_sim', 'score','matched_by_parent_name']
-    best_matches = pd.DataFrame(columns=columns, index=range(chair_df.shape[0]))
 
     comp_name_to_usa_mapping, parent_comp_name_to_usa_mapping = company_name_to_usa_df_mapping(companies, usa_df)
-    
-    for i in range(chair_df.shape[0]):
-        chair_candidate = chair_df.iloc[i]
-        index = cosine_similarities[i].indices
-
-        if i % 1000 == 0:
-            print(f'{i} of {chair_df.shape[0]} documents are calculated')
-
-        #if i == 1000:
-        #    break
-
-        if index.shape[0] == 0:
-            continue
-
-
-        usa_indexes = comp_name_to_usa_mapping[index].indices
-        parent_usa_indexes = parent_comp_name_to_usa_mapping[index].indices
-
-        expanded_cos_sims = []
-        # get child company cos sims
-        for j in range(len(cosine_similarities[i].indices)):
-            selection = comp_name_to_usa_mapping[index[j]]
-            expanded_cos_sims += [cosine_similarities[i].data[j]] * len(selection.indices)
-        
-        # get parent company cos sims
-        for j in range(len(cosine_similarities[i].indices)):
-            selection = parent_comp_name_to_usa_mapping[index[j]]
-            expanded_cos_sims += [cosine_similarities[i].data[j]] * len(selection.indices)
-
-        child_candidates = usa_df.iloc[usa_indexes].copy()
-        child_candidates['matched_by_parent_name'] = False
-        
-        parent_candidates = usa_df.iloc[parent_usa_indexes].copy()
-        parent_candidates['matched_by_parent_name'] = True
-        
-        candidates = pd.concat([child_candidates,parent_candidates], ignore_index=True)
-        candidates['cos_sim'] = expanded_cos_sims
-        #candidates['cos_sim'] = candidates.groupby(candidates.index)['cos_sim'].max()
-        candidates = candidates.drop_duplicates()
-        is_zip_bonus = (candidates.recipient_zip_code == chair_candidate.addzip) * ~candidates.matched_by_parent_name
-        candidates['zip_bonus'] = zip_bonus * is_zip_bonus
-        is_state_bonus = (candidates.recipient_state_fixed == chair_candidate.state_fixed) * ~candidates.matched_by_parent_name
-        candidates['state_bonus'] = state_bonus * is_state_bonus
-        is_address_bonus = (candidates.recipient_address_line_fixed == 
-                            chair_candidate.add_fixed) * ~candidates.matched_by_parent_name
-        candidates['address_bonus'] = address_bonus * is_address_bonus
-
-        candidates['total_bonus'] = candidates.zip_bonus + candidates.state_bonus + candidates.address_bonus
-
-        both_have_state = np.logical_and(~pd.isna(candidates.recipient_state_fixed),
-                                                                         ~pd.isna(chair_candidate.state_fixed))
-
-        no_match_condition = np.logical_and(np.logical_and(~candidates.matched_by_parent_name,
-                                                           ~is_state_bonus),both_have_state)
-
-        candidates['total_bonus'] += -(candidates['total_bonus']+candidates.cos_sim)*no_match_condition
-
-        candidates['score'] = candidates.cos_sim + candidates.total_bonus
-        # TODO: take the one with most data/count
-        candidate = candidates.loc[candidates.score.astype('float').idxmax()]
-        best_matches.iloc[i] = pd.concat([chair_candidate, candidate], axis=0)
-
-    return best_matches
\ No newline at end of file
+
+    for chunk_start in range(start, chair_df.shape[0], chunk_size):
+        chunk_end = min(chunk_start+chunk_size, chair_df.shape[0])
+        rows = []
+        for i in range(chunk_start, chunk_end):
+            chair_candidate = chair_df.iloc[i]
+            candidate = _score_candidates(i, chair_candidate, usa_df, cosine_similarities,
+                                          comp_name_to_usa_mapping, parent_comp_name_to_usa_mapping,
+                                          zip_bonus, state_bonus, address_bonus)
+            if candidate is None:
+                continue
+            row = pd.concat([chair_candidate, candidate], axis=0)
+            row.name = i
+            rows.append(row)
+
+        # build the chunk at once so that pandas infers a dtype per column
+        chunk = pd.DataFrame(rows, columns=columns)
+        chunk = chunk.infer_objects()
+        print(f'{chunk_end} of {chair_df.shape[0]} documents are calculated')
+        yield chunk_end, chunk
+
+
+def write_best_candidates(chair_df, usa_df, cosine_similarities, companies, save_path='../results/matching_table.csv',
+                          zip_bonus = 0.1, state_bonus=0.1, address_bonus= 0.3, chunk_size=1000):
+    """Score `chair_df` in chunks and append the best matches to a .csv file.
+
+    After every finished chunk, the number of scored rows and the size of `save_path`
+    are written to a `<save_path>.checkpoint` file. If that file exists when this
+    function is called, scoring resumes after the last finished chunk and anything
+    written to `save_path` after it is discarded. The checkpoint also records the
+    bonuses and a fingerprint of the inputs; if they differ from the current call,
+    the old results are discarded and scoring starts over. The checkpoint is removed
+    once all rows have been scored.
+    """
+    save_path = Path(save_path)
+    checkpoint_path = save_path.with_name(save_path.name + '.checkpoint')
+    # cheap fingerprint of the job, so that a checkpoint is only resumed by the same job
+    job = {'zip_bonus': zip_bonus, 'state_bonus': state_bonus, 'address_bonus': address_bonus,
+           'chair_rows': chair_df.shape[0], 'usa_rows': usa_df.shape[0],
+           'cos_sim_shape': list(cosine_similarities.shape), 'cos_sim_nnz': int(cosine_similarities.nnz),
+           'cos_sim_sum': float(cosine_similarities.sum())}
+
+    checkpoint = None
+    if checkpoint_path.is_file() and save_path.is_file():
+        checkpoint = json.loads(checkpoint_path.read_text())
+        if checkpoint.get('job') != job:
+            print(f'{checkpoint_path} belongs to a different job, starting over.')
+            checkpoint = None
+
+    start = 0
+    if checkpoint is not None:
+        start = checkpoint['rows']
+        # drop whatever a crashed run wrote after the last finished chunk
+        with open(save_path, 'r+b') as f:
+            f.truncate(checkpoint['bytes'])
+        print(f'Resuming from row {start} of {chair_df.shape[0]}.')
+    elif save_path.is_file():
+        save_path.unlink()
+
+    for chunk_end, chunk in iter_best_candidates(chair_df, usa_df, cosine_similarities, companies,
+                                                 zip_bonus=zip_bonus, state_bonus=state_bonus,
+                                                 address_bonus=address_bonus, chunk_size=chunk_size,
+                                                 start=start):
+        write_header = not save_path.is_file()
+        with open(save_path, 'a', encoding='utf-8', newline='') as f:
+            chunk.to_csv(f, header=write_header)
+            f.flush()
+            os.fsync(f.fileno())
+        # write the checkpoint atomically so that it never points into a partial chunk
+        tmp_path = checkpoint_path.with_name(checkpoint_path.name + '.tmp')
+        tmp_path.write_text(json.dumps({'job': job, 'rows': chunk_end,
+                                        'bytes': save_path.stat().st_size}))
+        os.replace(tmp_path, checkpoint_path)
+
+    if checkpoint_path.is_file():
+        checkpoint_path.unlink()
+
+
+def get_best_candidates(chair_df, usa_df, cosine_similarities, companies, zip_bonus = 0.1, state_bonus=0.1,
+                        address_bonus= 0.3, chunk_size=1000):
+    columns = list(chair_df.columns) + list(usa_df.columns) + ['cos_sim', 'score','matched_by_parent_name']
+    chunks = [chunk for _, chunk in iter_best_candidates(chair_df, usa_df, cosine_similarities, companies,
+                                                        zip_bonus=zip_bonus, state_bonus=state_bonus,
+                                                        address_bonus=address_bonus, chunk_size=chunk_size)]
+    if not chunks:
+        return pd.DataFrame(columns=columns, index=range(chair_df.shape[0]))
+    # keep one row per chair_df row, rows without a match are all NaN
+    return pd.concat(chunks).reindex(range(chair_df.shape[0]))
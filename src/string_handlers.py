@@ -1,5 +1,34 @@
+from functools import lru_cache
+
 import pandas as pd
-from postal.expand import expand_address
+
+
+@lru_cache(maxsize=None)
+def _get_expand_address():
+    """Import `pypostal`'s `expand_address`.
+
+    Importing `postal.expand` loads libpostal's model data, so it is deferred
+    until the first address is expanded and done only once per process.
+    """
+    from postal.expand import expand_address
+
+    return expand_address
+
+
+def expand(raw_addr) -> str:
+    """Expand and normalize a single address using `pypostal`.
+
+    Parameters:
+        raw_addr: str
+            Address to expand. NAs are treated as empty strings.
+
+    Returns:
+        str
+            The first expansion of `raw_addr` in upper case, or "" if there is none.
+    """
+    addr = str(raw_addr) if pd.notna(raw_addr) else ""
+    addr = _get_expand_address()(addr)
+    return addr[0].upper() if len(addr) > 0 else ""
 
 
 def fix_letters(ser: pd.Series) -> pd.Series:
@@ -141,11 +170,6 @@ def fix_addresses(df: pd.DataFrame, addr_cols=None) -> pd.Series:
     # process only unique values, merge results later
     uniq = joined_addr.unique()
 
-    def expand(raw_addr):
-        addr = str(raw_addr) if pd.notna(raw_addr) else ""
-        addr = expand_address(addr)
-        return addr[0].upper() if len(addr) > 0 else ""
-
     res = pd.Series(map(expand, uniq))
     lookup = pd.DataFrame({"uniq": uniq, "clean": res})
     return (
@@ -0,0 +1,71 @@
+import sys
+import types
+
+import pandas as pd
+import pytest
+
+from src import addr, string_handlers
+
+
+@pytest.fixture
+def expand_calls(monkeypatch):
+    """Replace `postal.expand` with a stub that records its inputs."""
+    calls = []
+
+    def expand_address(raw_addr):
+        calls.append(raw_addr)
+        return [raw_addr.lower()] if raw_addr.strip() else []
+
+    postal_expand = types.ModuleType("postal.expand")
+    postal_expand.expand_address = expand_address
+    monkeypatch.setitem(sys.modules, "postal", types.ModuleType("postal"))
+    monkeypatch.setitem(sys.modules, "postal.expand", postal_expand)
+    string_handlers._get_expand_address.cache_clear()
+    yield calls
+    string_handlers._get_expand_address.cache_clear()
+
+
+def test_process_addresses(expand_calls, tmp_path):
+    pytest.importorskip("openpyxl")
+    chair_path = tmp_path / "chair.xlsx"
+    us_path = tmp_path / "us.csv"
+    chair_out_path = tmp_path / "chair_addr.csv"
+    us_out_path = tmp_path / "us_addr.csv"
+    pd.DataFrame(
+        {
+            "gvkey": [1, 2, 3],
+            "state": ["CA", None, "CA"],
+            "add1": ["1 Main", "2 Oak", "1 Main"],
+            "add2": [None, "Apt 3", None],
+            "add3": [None] * 3,
+            "add4": [None] * 3,
+        }
+    ).to_excel(chair_path, index=False)
+    pd.DataFrame(
+        {
+            "recipient_address_line_1": ["1 Main", "9 Elm", "9 Elm"],
+            "recipient_address_line_2": [None, "x", "x"],
+            "recipient_state_code": ["CA", "NY", "TX"],
+            "recipient_name": ["A", "B", "C"],
+        }
+    ).to_csv(us_path, index=False)
+
+    addr.process_addresses(chair_path, us_path, chair_out_path, us_out_path)
+
+    ch = pd.read_csv(chair_out_path, keep_default_na=False)
+    us = pd.read_csv(us_out_path, keep_default_na=False)
+    assert list(ch.columns) == ["gvkey", "state_fixed", "add_fixed"]
+    assert list(us.columns) == [
+        "recipient_address_line_1",
+        "recipient_address_line_2",
+        "recipient_state_code",
+        "recipient_state_fixed",
+        "recipient_address_line_fixed",
+    ]
+    assert list(ch.state_fixed) == ["CALIFORNIA", "", "CALIFORNIA"]
+    assert list(us.recipient_state_fixed) == ["CALIFORNIA", "NEW YORK", "TEXAS"]
+    assert ch.add_fixed[0] == ch.add_fixed[2]
+    # every unique joined address is expanded exactly once per dataset
+    assert sorted(expand_calls) == sorted(
+        ["1 Main   ", "2 Oak Apt 3  ", "1 Main ", "9 Elm x"]
+    )
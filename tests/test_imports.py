@@ -0,0 +1,27 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ("postal", "scipy", "sklearn")
+
+
+@pytest.mark.parametrize(
+    "module", ["src.string_handlers", "src.addr", "src.matrix_ops"]
+)
+def test_import_does_not_load_heavy_dependencies(module):
+    code = (
+        f"import sys, {module}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=str(REPO_DIR),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stdout.strip() == ""
@@ -0,0 +1,123 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from src import matrix_ops
+
+
+@pytest.fixture
+def job():
+    companies = np.array(["A", "B", "C"])
+    usa_df = pd.DataFrame(
+        {
+            "clean_recipient_name": ["A", "B", "C", "A"],
+            "clean_recipient_parent_name": ["B", None, None, "C"],
+            "clean_recipient_doing_business_as_name": [None] * 4,
+            "recipient_zip_code": ["1", "2", "3", "1"],
+            "recipient_state_fixed": ["X", "Y", "X", "X"],
+            "recipient_address_line_fixed": ["a", "b", "c", "d"],
+        }
+    )
+    chair_df = pd.DataFrame(
+        {
+            "conm": list("pqrstu"),
+            "addzip": ["1", "2", "3", "9", "1", "2"],
+            "state_fixed": ["X", "Y", "X", "X", "X", "Y"],
+            "add_fixed": ["a", "b", "z", "q", "d", "b"],
+        }
+    )
+    cosine_similarities = sparse.csr_matrix(
+        np.array(
+            [
+                [0.9, 0, 0],
+                [0, 0.8, 0],
+                [0, 0, 0],
+                [0.5, 0, 0.7],
+                [1, 0, 0],
+                [0, 0.6, 0],
+            ]
+        )
+    )
+    return chair_df, usa_df, cosine_similarities, companies
+
+
+def _crash_after(n_chunks, monkeypatch):
+    """Make `write_best_candidates` crash after writing `n_chunks` chunks."""
+    iter_best_candidates = matrix_ops.iter_best_candidates
+
+    def crashing(*args, **kwargs):
+        for n, res in enumerate(iter_best_candidates(*args, **kwargs)):
+            if n == n_chunks:
+                raise KeyboardInterrupt
+            yield res
+
+    monkeypatch.setattr(matrix_ops, "iter_best_candidates", crashing)
+
+
+def test_write_best_candidates_resumes_after_crash(job, tmp_path, monkeypatch):
+    expected_path = tmp_path / "expected.csv"
+    matrix_ops.write_best_candidates(*job, save_path=expected_path, chunk_size=2)
+
+    save_path = tmp_path / "matches.csv"
+    with monkeypatch.context() as m:
+        _crash_after(2, m)
+        with pytest.raises(KeyboardInterrupt):
+            matrix_ops.write_best_candidates(*job, save_path=save_path, chunk_size=2)
+    checkpoint = json.loads((tmp_path / "matches.csv.checkpoint").read_text())
+    assert checkpoint["rows"] == 4
+    finished = save_path.read_bytes()
+    assert len(finished) == checkpoint["bytes"]
+    # simulate a chunk that was only partially written before the crash
+    with open(save_path, "a") as f:
+        f.write("5,u,2,Y,b,B")
+
+    starts = []
+    scored_rows = []
+    iter_best_candidates = matrix_ops.iter_best_candidates
+    score_candidates = matrix_ops._score_candidates
+
+    def recording_iter(*args, **kwargs):
+        starts.append(kwargs["start"])
+        return iter_best_candidates(*args, **kwargs)
+
+    def recording_score(i, *args, **kwargs):
+        scored_rows.append(i)
+        return score_candidates(i, *args, **kwargs)
+
+    monkeypatch.setattr(matrix_ops, "iter_best_candidates", recording_iter)
+    monkeypatch.setattr(matrix_ops, "_score_candidates", recording_score)
+    matrix_ops.write_best_candidates(*job, save_path=save_path, chunk_size=2)
+
+    # only the rows after the last finished chunk are scored again
+    assert starts == [4]
+    assert scored_rows == [4, 5]
+    # the finished chunks are kept as they are, the partial line is truncated
+    resumed = save_path.read_bytes()
+    assert resumed[: len(finished)] == finished
+    assert resumed.count(b"5,u,2,Y,b,B") == 1
+    assert resumed == expected_path.read_bytes()
+    assert not (tmp_path / "matches.csv.checkpoint").exists()
+
+
+def test_write_best_candidates_starts_over_for_different_job(
+    job, tmp_path, monkeypatch
+):
+    expected_path = tmp_path / "expected.csv"
+    matrix_ops.write_best_candidates(
+        *job, save_path=expected_path, chunk_size=2, zip_bonus=0.5
+    )
+
+    save_path = tmp_path / "matches.csv"
+    with monkeypatch.context() as m:
+        _crash_after(2, m)
+        with pytest.raises(KeyboardInterrupt):
+            matrix_ops.write_best_candidates(*job, save_path=save_path, chunk_size=2)
+
+    matrix_ops.write_best_candidates(
+        *job, save_path=save_path, chunk_size=2, zip_bonus=0.5
+    )
+
+    assert save_path.read_bytes() == expected_path.read_bytes()